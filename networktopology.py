@@ -1,8 +1,14 @@
+from importlib.util import find_spec
+
 import streamlit as st
 import networkx as nx
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from networkx.algorithms import approximation as approx
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
 
 # ================= PAGE SETUP =================
 st.set_page_config(
@@ -13,8 +19,186 @@ st.set_page_config(
 # ================= SESSION STATE =================
 if "nodes" not in st.session_state:
     st.session_state.nodes = {}
-if "links" not in st.session_state:
-    st.session_state.links = []
+if "links_u" not in st.session_state:
+    st.session_state.links_u = []
+    st.session_state.links_v = []
+    st.session_state.links_w = []
+if "version" not in st.session_state:
+    st.session_state.version = 0
+
+
+# ================= LAYOUT =================
+BARNES_HUT_MIN_NODES = 300
+
+
+def scatter_add(index, values, size):
+    return np.column_stack([np.bincount(index, weights=values[:, c], minlength=size) for c in range(2)])
+
+
+def sfdp_layout(G, seed=0, iterations=50, theta=0.8):
+    """Force-directed layout with Barnes-Hut style lumping of distant repulsion."""
+    nodes = list(G)
+    n = len(nodes)
+    index = {v: i for i, v in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.intp).reshape(-1, 2)
+
+    P = np.random.default_rng(seed).random((n, 2))
+    k = 1 / np.sqrt(n)
+    t = 0.1
+    side = max(1, int(np.ceil(n ** (1 / 3))))
+    eps = 1e-12
+
+    for _ in range(iterations):
+        # bucket devices into a side x side grid of quadtree cells
+        lo = P.min(0)
+        h = (P.max(0) - lo).max() / side + eps
+        cell_xy = np.minimum(((P - lo) / h).astype(np.intp), side - 1)
+        cells, member_of, mass = np.unique(
+            cell_xy[:, 0] * side + cell_xy[:, 1], return_inverse=True, return_counts=True
+        )
+        com = scatter_add(member_of, P, len(cells)) / mass[:, None]
+
+        # cells that look small from a device are lumped at their centre of mass
+        delta = P[:, None, :] - com[None, :, :]
+        dist2 = (delta ** 2).sum(-1) + eps
+        far = h * h < theta * theta * dist2
+        far[np.arange(n), member_of] = False
+        disp = k ** 2 * ((mass * far / dist2)[:, :, None] * delta).sum(1)
+
+        # every other cell is resolved device by device
+        order = np.argsort(member_of, kind="stable")
+        starts = np.cumsum(mass) - mass
+        near_i, near_c = np.nonzero(~far)
+        counts = mass[near_c]
+        i = np.repeat(near_i, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(starts[near_c], counts) + offsets]
+        i, j = i[i != j], j[i != j]
+        d = P[i] - P[j]
+        disp += scatter_add(i, k ** 2 * d / ((d ** 2).sum(1) + eps)[:, None], n)
+
+        # attraction only along links
+        d = P[edges[:, 0]] - P[edges[:, 1]]
+        f = d * (np.sqrt((d ** 2).sum(1)) / k)[:, None]
+        disp += scatter_add(edges[:, 1], f, n) - scatter_add(edges[:, 0], f, n)
+
+        length = np.sqrt((disp ** 2).sum(1)) + eps
+        P += disp * (np.minimum(length, t) / length)[:, None]
+        t *= 0.95
+
+    return dict(zip(nodes, nx.rescale_layout(P)))
+
+
+# ================= ROUTING =================
+GPU_MIN_NODES = 500
+CUGRAPH_AVAILABLE = find_spec("nx_cugraph") is not None
+
+
+def backend_kwargs(G):
+    """Dispatch to the nx-cugraph GPU backend once the network is big enough to pay for it."""
+    if (
+        CUGRAPH_AVAILABLE
+        and not st.session_state.get("cugraph_failed")
+        and G.number_of_nodes() > GPU_MIN_NODES
+    ):
+        return {"backend": "cugraph"}
+    return {}
+
+
+def shortest_route(G, src, dst):
+    backend = backend_kwargs(G)
+    if backend:
+        try:
+            path = nx.shortest_path(G, src, dst, weight="weight", **backend)
+            return nx.path_weight(G, path, weight="weight"), path
+        except nx.NetworkXNoPath:
+            raise
+        except Exception:  # nx-cugraph is installed but no usable GPU
+            st.session_state.cugraph_failed = True
+    return nx.bidirectional_dijkstra(G, src, dst, weight="weight")
+
+
+# ================= TOPOLOGY RULES =================
+TOPOLOGIES = [
+    ("Hybrid Topology", "Combination of multiple topology characteristics."),
+    ("Star Topology", "One central node connected to all others."),
+    ("Ring Topology", "Each node connected to exactly two neighbors."),
+    ("Full Mesh Topology", "Every node directly connected to all others."),
+    ("Bus Topology", "Linear connection with two end devices."),
+    ("Tree Topology", "Hierarchical structure with no cycles."),
+]
+
+
+def fingerprint(deg, e):
+    return len(deg), e, np.sort(deg).tobytes()
+
+
+def topology_templates(n):
+    # sorted degree sequences of the canonical shapes, built without any graph
+    templates = [(3, n * (n - 1) // 2, np.full(n, n - 1, dtype=np.int32))]
+    if n >= 2:
+        bus = np.full(n, 2, dtype=np.int32)
+        bus[:2] = 1
+        templates.insert(0, (4, n - 1, bus))
+    if n >= 3:
+        templates.append((2, n, np.full(n, 2, dtype=np.int32)))
+    if n != 2:
+        star = np.ones(n, dtype=np.int32)
+        star[-1] = n - 1
+        templates.append((1, n - 1, star))
+
+    # later templates win, matching the priority star > ring > mesh > bus
+    return {fingerprint(deg, e): code for code, e, deg in templates}
+
+
+def classify(deg, n, e, connected):
+    code = topology_templates(n).get(fingerprint(deg, e), 0)
+    # a path plus separate rings shares the bus fingerprint
+    if code == 4 and not connected:
+        code = 0
+    # a connected graph with n - 1 links is a tree, no traversal needed
+    if code == 0 and connected and e == n - 1:
+        code = 5
+    return code
+
+
+# ================= CACHED ANALYSIS =================
+def graph_key(G, weighted=True):
+    """Canonical bytes for the network, used as the argument cache_data hashes."""
+    key = nx.to_sparse6_bytes(G, header=False) + repr(tuple(G)).encode()
+    if weighted:
+        A = nx.to_scipy_sparse_array(G, weight="weight", dtype=np.int64, format="csr")
+        A.sort_indices()
+        key += A.data.tobytes()
+    return key
+
+
+def build_graph(nodes, links):
+    G = nx.Graph()
+    G.add_nodes_from((n, {"type": t}) for n, t in nodes)
+    G.add_weighted_edges_from(links)
+    return G
+
+
+@st.cache_data(max_entries=8)
+def spring_layout_cached(key, _G, seed=0):
+    if _G.number_of_nodes() >= BARNES_HUT_MIN_NODES:
+        return sfdp_layout(_G, seed=seed)
+    return nx.spring_layout(_G, weight=None, seed=seed)
+
+
+@st.cache_data(max_entries=8)
+def mst_and_connected(key, _G):
+    A = nx.to_scipy_sparse_array(_G, weight="weight", format="csr")
+    if connected_components(A, directed=False, return_labels=False) > 1:
+        return False, None
+    return True, int(minimum_spanning_tree(A).sum())
+
+
+@st.cache_data(max_entries=8)
+def detect_topology(deg, n, e, connected):
+    return TOPOLOGIES[classify(deg, n, e, connected)]
+
 
 # ================= TITLE =================
 st.title("📡 Network Topology Analysis Using Graph Theory")
@@ -24,7 +208,9 @@ st.markdown(
 )
 
 # ================= SIDEBAR =================
-with st.sidebar:
+# building the network only reruns the sidebar; the analysis reruns on demand
+@st.fragment
+def infrastructure_builder():
     st.header("🛠️ Infrastructure Builder")
 
     with st.form("node_form"):
@@ -32,63 +218,89 @@ with st.sidebar:
         ntype = st.selectbox("Device Type", ["PC", "Switch", "Router"])
         if st.form_submit_button("Add Device"):
             st.session_state.nodes[nid] = ntype
-            st.rerun()
+            st.session_state.version += 1
 
     st.header("🔗 Link Setup")
     if len(st.session_state.nodes) >= 2:
+        node_list = tuple(st.session_state.nodes)
         with st.form("link_form"):
-            a = st.selectbox("Device A", list(st.session_state.nodes.keys()))
-            b = st.selectbox("Device B", list(st.session_state.nodes.keys()))
+            a = st.selectbox("Device A", node_list)
+            b = st.selectbox("Device B", node_list)
             w = st.number_input("Link Cost", min_value=1, value=10)
             if st.form_submit_button("Add Link") and a != b:
-                st.session_state.links.append({"u": a, "v": b, "w": w})
-                st.rerun()
+                st.session_state.links_u.append(a)
+                st.session_state.links_v.append(b)
+                st.session_state.links_w.append(w)
+                st.session_state.version += 1
+
+    if st.button("📊 Generate Report", type="primary"):
+        st.rerun()
 
     if st.button("🗑️ Reset Network"):
         st.session_state.nodes = {}
-        st.session_state.links = []
+        st.session_state.links_u = []
+        st.session_state.links_v = []
+        st.session_state.links_w = []
+        st.session_state.version += 1
         st.rerun()
 
+
+with st.sidebar:
+    infrastructure_builder()
+
 # ================= BUILD GRAPH =================
 if not st.session_state.nodes:
-    st.info("Add devices and links from sidebar.")
+    st.info("Add devices and links from sidebar, then generate the report.")
     st.stop()
 
-G = nx.Graph()
-for n, t in st.session_state.nodes.items():
-    G.add_node(n, type=t)
+if st.session_state.get("graph_version") != st.session_state.version:
+    G = build_graph(
+        st.session_state.nodes.items(),
+        zip(st.session_state.links_u, st.session_state.links_v, st.session_state.links_w),
+    )
+    st.session_state.graph = G
+    st.session_state.graph_keys = (graph_key(G), graph_key(G, weighted=False))
+    st.session_state.graph_version = st.session_state.version
 
-for l in st.session_state.links:
-    G.add_edge(l["u"], l["v"], weight=l["w"])
+G = st.session_state.graph
+key, layout_key = st.session_state.graph_keys
+node_list = tuple(G)
 
 # ================= VISUAL =================
 st.subheader("🖼️ Network Topology Diagram")
-fig, ax = plt.subplots(figsize=(10, 6))
-pos = nx.spring_layout(G)
-nx.draw(G, pos, with_labels=True, node_size=1500, width=2)
-nx.draw_networkx_edge_labels(G, pos, edge_labels=nx.get_edge_attributes(G, "weight"))
-st.pyplot(fig)
+# positions depend only on which devices are linked, never on link cost
+pos = spring_layout_cached(layout_key, G)
+
+# redraw only when the network itself changed, otherwise reuse the rendered figure
+if st.session_state.get("fig_key") != key:
+    if "fig" in st.session_state:
+        plt.close(st.session_state.fig)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    nx.draw(G, pos, ax=ax, with_labels=True, node_size=1500, width=2)
+    nx.draw_networkx_edge_labels(G, pos, ax=ax, edge_labels=nx.get_edge_attributes(G, "weight"))
+    st.session_state.fig = fig
+    st.session_state.fig_key = key
+st.pyplot(st.session_state.fig, clear_figure=False)
 
 # ================= SHORTEST PATH =================
 st.divider()
 st.subheader("🛤️ Shortest Path (Dijkstra)")
 
-src = st.selectbox("Source", list(G.nodes()), key="sp_s")
-dst = st.selectbox("Destination", list(G.nodes()), key="sp_d")
+src = st.selectbox("Source", node_list, key="sp_s")
+dst = st.selectbox("Destination", node_list, key="sp_d")
 
 ospf_path, ospf_cost = None, None
 
 if st.button("Compute Shortest Path"):
-    ospf_path = nx.shortest_path(G, src, dst, weight="weight")
-    ospf_cost = nx.shortest_path_length(G, src, dst, weight="weight")
-    st.success(" ➔ ".join(ospf_path))
-    st.info(f"Total Cost = {ospf_cost}")
+    try:
+        ospf_cost, ospf_path = shortest_route(G, src, dst)
+        st.success(" ➔ ".join(ospf_path))
+        st.info(f"Total Cost = {ospf_cost}")
+    except nx.NetworkXNoPath:
+        st.error(f"No path between {src} and {dst}.")
 
 # ================= MST =================
-mst_cost = None
-if nx.is_connected(G):
-    mst = nx.minimum_spanning_tree(G, weight="weight")
-    mst_cost = sum(mst[u][v]["weight"] for u, v in mst.edges())
+connected, mst_cost = mst_and_connected(key, G)
 
 # ================= TOPOLOGY IDENTIFICATION =================
 st.divider()
@@ -96,30 +308,8 @@ st.subheader("🌐 Network Topology Identification")
 
 n = G.number_of_nodes()
 e = G.number_of_edges()
-degrees = list(dict(G.degree()).values())
-
-topology = "Hybrid Topology"
-reason = "Combination of multiple topology characteristics."
-
-if max(degrees) == n - 1 and degrees.count(1) == n - 1:
-    topology = "Star Topology"
-    reason = "One central node connected to all others."
-
-elif n >= 3 and all(d == 2 for d in degrees):
-    topology = "Ring Topology"
-    reason = "Each node connected to exactly two neighbors."
-
-elif e == n * (n - 1) // 2:
-    topology = "Full Mesh Topology"
-    reason = "Every node directly connected to all others."
-
-elif nx.is_tree(G) and degrees.count(1) == 2 and all(d in [1, 2] for d in degrees):
-    topology = "Bus Topology"
-    reason = "Linear connection with two end devices."
-
-elif nx.is_tree(G):
-    topology = "Tree Topology"
-    reason = "Hierarchical structure with no cycles."
+deg = np.fromiter((len(nbrs) for nbrs in G._adj.values()), dtype=np.int32, count=n)
+topology, reason = detect_topology(deg, n, e, connected)
 
 st.success(f"Detected Topology: **{topology}**")
 